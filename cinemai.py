@@ -1,27 +1,41 @@
+import asyncio
+import hashlib
 import os
-import random
-import string
+import re
+import secrets
+import threading
+from collections import OrderedDict
 from enum import Enum
 import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
 
 import click
-import json
+import httpx
+import openai
+import orjson
 from rich import console
-from rich.prompt import Prompt
+from rich.live import Live
 from rich.text import Text
 from rich.padding import Padding
 from dotenv import load_dotenv
 from langchain.chains.graph_qa.cypher import GraphCypherQAChain
-from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_community.cache import SQLiteCache
 from langchain_community.graphs import Neo4jGraph
 from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.globals import set_llm_cache
+from langchain_core.messages import AIMessageChunk
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import Runnable
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
 
 from langchain_core.tracers.base import logger as tracer_logger
 
+from utils.chat_history import BoundedChatMessageHistory, compact_history
+from utils.neo4j_graph import PooledNeo4jGraph, get_neo4j_driver
 from utils.response_handler import ResponseHandlerFactory, ResponseTypes
+from utils.retry import ainvoke_with_retry, astream_with_retry
 
 
 # supress warnings from that logger
@@ -30,12 +44,72 @@ tracer_logger.setLevel(logging.ERROR)
 load_dotenv()
 
 NEO4J_URL = os.getenv("NEO4J_URL")
-NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
-      
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cinemai_cache.db")
+
 Console = console.Console()
 
-_SESSION_STORE = {}
+# the number of exchanges kept in a session's history, the number of sessions kept in memory,
+# and the number of history tokens after which older messages are summarized
+MAX_HISTORY_TURNS = 10
+MAX_SESSIONS = 100
+MAX_HISTORY_TOKENS = 2000
+
+# session histories, ordered from least to most recently used
+_SESSION_STORE = OrderedDict()
+
+# the per-turn context is sent separately from the question, after the system prompt and the history
+_ROUTING_CONTEXT = "Context: the user query has not been classified yet."
+_ROUTING_INSTRUCTIONS = (
+    "Classify it and, unless it is classified as Q, respond to it directly "
+    "(remember to incorporate any and all past feedback)."
+)
+_CLASSIFIER_INSTRUCTIONS = (
+    "Only classify it, by calling the classify_and_reply tool whatever the classification, and do not respond to it."
+)
+_RESPONSE_INSTRUCTIONS = "Using the context, respond to following query (remember to incorporate any and all past feedback):"
+
+# short messages that are clearly feedback, e.g. "thanks!" or "bad answer", as opposed to "good movies from 1999"
+_FEEDBACK_PATTERN = re.compile(
+    r"^\s*(thanks|thank you|(good|great|bad|wrong)( (job|answer|response|one))?)\b[\s.!,]*$",
+    re.IGNORECASE,
+)
+
+# lets a single call either classify the query as needing the database, or respond to it directly
+CLASSIFY_AND_REPLY_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "classify_and_reply",
+        "description": "Classify a user query that requires a database query to answer.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "type": {
+                    "type": "string",
+                    "enum": [type_.value for type_ in ResponseTypes],
+                    "description": "The classification of the user query.",
+                },
+                "cypher_hint": {
+                    "type": "string",
+                    "description": "Any relevant information from past interactions needed to query the database.",
+                },
+            },
+            "required": ["type"],
+        },
+    },
+}
+
+# the same tool for a classifier model that is forced to call it on every query
+CLASSIFY_TOOL = {
+    "type": "function",
+    "function": {**CLASSIFY_AND_REPLY_TOOL["function"], "description": "Classify the user query."},
+}
+
+# compiled prompt templates, keyed by the SHA-256 of the prompt they were built from,
+# and by the path and modification time of the file the prompt was read from
+_PROMPT_TEMPLATES: Dict[str, ChatPromptTemplate] = {}
+_PROMPT_CACHE: Dict[Tuple[str, int], ChatPromptTemplate] = {}
 
 
 class Model(str, Enum):
@@ -43,12 +117,13 @@ class Model(str, Enum):
 
     GPT4_Turbo = "gpt-4-turbo"
     GPT4 = "gpt-4"
+    GPT4o_Mini = "gpt-4o-mini"
     GPT3_5_Turbo = "gpt-3.5-turbo"
     GPT3_5 = "gpt-3.5"
 
 
 def generate_session_id(length: int = 6) -> str:
-    """Generates a random session ID.
+    """Generates a random, URL-safe session ID.
 
     Args:
         length (int, optional): The length of the session ID. Defaults to 6.
@@ -56,7 +131,8 @@ def generate_session_id(length: int = 6) -> str:
     Returns:
         str: The session ID.
     """
-    return "".join(random.choices(string.ascii_letters + string.digits, k=length))
+    # each byte encodes to more than one character, so the token is always at least `length` long
+    return secrets.token_urlsafe(length)[:length]
 
 
 def create_neo4j_graph(
@@ -65,25 +141,35 @@ def create_neo4j_graph(
     password: str = NEO4J_PASSWORD,
     timeout: int = 30,
     sanitize: bool = False,  # no sanitization for the sandbox environment,
+    max_connection_pool_size: int = 50,
     **kwargs,
 ) -> Neo4jGraph:
-    """Creates a Neo4jGraph instance that connects to the Neo4j database.
+    """Creates a Neo4jGraph instance that connects to the Neo4j database through a shared, pooled driver.
 
     Args:
-        url (str, optional): The URL of the Neo4j database. Defaults to NEO4J_URL.
-        user (str, optional): The username of the Neo4j database. Defaults to NEO4J_USER.
+        url (str, optional): The URL of the Neo4j database. Defaults to NEO4J_URL, or the NEO4J_URI environment
+            variable.
+        user (str, optional): The username of the Neo4j database. Defaults to NEO4J_USER, or the NEO4J_USERNAME
+            environment variable, or "neo4j".
         password (str, optional): The password of the Neo4j database. Defaults to NEO4J_PASSWORD.
         timeout (int, optional): The timeout in seconds for the connection. Defaults to 30.
         sanitize (bool, optional): Whether to sanitize the Cypher queries. Defaults to False.
-        **kwargs: Additional keyword arguments to pass to the Neo4jGraph constructor.
+        max_connection_pool_size (int, optional): The maximum number of pooled connections, which also bounds the
+            number of concurrent queries. Defaults to 50.
+        **kwargs: Additional keyword arguments to pass to the PooledNeo4jGraph constructor.
 
     Returns:
         Neo4jGraph: The Neo4jGraph instance.
     """
-    return Neo4jGraph(
-        url=url,
-        username=user,
-        password=password,
+    driver = get_neo4j_driver(
+        url,
+        user,
+        password,
+        max_connection_pool_size=max_connection_pool_size,
+        connection_acquisition_timeout=timeout,
+    )
+    return PooledNeo4jGraph(
+        driver,
         timeout=timeout,
         sanitize=sanitize,
         **kwargs,
@@ -96,6 +182,8 @@ def create_cypher_chain(
     temperature: float = 0,
     verbose: bool = False,
     validate_cypher: bool = True,
+    client: Optional[Any] = None,
+    async_client: Optional[Any] = None,
 ) -> GraphCypherQAChain:
     """Creates a GraphCypherQAChain instance with the specified graph and language model.
 
@@ -105,14 +193,25 @@ def create_cypher_chain(
         temperature (float, optional): The temperature to use for the language model. Defaults to 0.
         verbose (bool, optional): Whether to enable verbose mode. Defaults to False.
         validate_cypher (bool, optional): Whether to validate the Cypher queries. Defaults to True.
+        client (Any, optional): The OpenAI chat completions client for sync calls to the language model.
+            Defaults to None.
+        async_client (Any, optional): The OpenAI chat completions client for async calls to the language model.
+            Defaults to None.
 
     Returns:
         GraphCypherQAChain: The GraphCypherQAChain instance.
     """
+    # the same language model generates the Cypher queries and answers using their results
+    llm = ChatOpenAI(
+        temperature=temperature,
+        model=model,
+        client=client,
+        async_client=async_client,
+    )
     return GraphCypherQAChain.from_llm(
         graph=graph,
-        cypher_llm=ChatOpenAI(temperature=temperature, model=model),
-        qa_llm=ChatOpenAI(temperature=temperature, model=model),
+        cypher_llm=llm,
+        qa_llm=llm,
         validate_cypher=validate_cypher,
         verbose=verbose,
     )
@@ -125,23 +224,39 @@ def load_system_prompt_template(path: str = "prompts/system.md") -> ChatPromptTe
         path (str, optional): The path to the Markdown file. Defaults to "prompts/system.md".
 
     Returns:
-        ChatPromptTemplate: The system prompt template, with two placeholders for the {{history}} and the {{question}},
-        respectively.
+        ChatPromptTemplate: The system prompt template, with placeholders for the {{history}}, the {{context}}, the
+        {{instructions}} and the {{question}}, respectively. The static system prompt and the history come first, so
+        that the prompt prefix stays identical across turns and can be cached by the provider.
     """
+    global _PROMPT_TEMPLATES, _PROMPT_CACHE
+
+    # an unmodified file is not read again
+    cache_key = (path, os.stat(path).st_mtime_ns)
+    if cache_key in _PROMPT_CACHE:
+        return _PROMPT_CACHE[cache_key]
+
     with open(path, "r") as file:
         prompt_content = file.read()
 
-    return ChatPromptTemplate.from_messages(
-        [
-            ("system", prompt_content),
-            MessagesPlaceholder(variable_name="history"),
-            ("human", "{question}"),
-        ]
-    )
+    # reloading an unchanged prompt reuses the template compiled for it
+    prompt_hash = hashlib.sha256(prompt_content.encode()).hexdigest()
+    if prompt_hash not in _PROMPT_TEMPLATES:
+        _PROMPT_TEMPLATES[prompt_hash] = ChatPromptTemplate.from_messages(
+            [
+                ("system", prompt_content),
+                MessagesPlaceholder(variable_name="history"),
+                ("system", "{context} {instructions}"),
+                ("human", "{question}"),
+            ]
+        )
+    _PROMPT_CACHE[cache_key] = _PROMPT_TEMPLATES[prompt_hash]
+    return _PROMPT_CACHE[cache_key]
 
 
 def get_session_history(session_id: str) -> BaseChatMessageHistory:
     """Get a cached ChatMessageHistory instance for the given session ID, or create a new one if it does not exist.
+    Only the last MAX_HISTORY_TURNS exchanges are kept per session, and the least recently used session is evicted
+    once there are more than MAX_SESSIONS.
 
     Args:
         session_id (str): unique identifier for the session.
@@ -151,55 +266,254 @@ def get_session_history(session_id: str) -> BaseChatMessageHistory:
     """
     global _SESSION_STORE
 
-    if session_id not in _SESSION_STORE:
-        _SESSION_STORE[session_id] = ChatMessageHistory()
+    if session_id in _SESSION_STORE:
+        _SESSION_STORE.move_to_end(session_id)
+    else:
+        _SESSION_STORE[session_id] = BoundedChatMessageHistory(max_messages=2 * MAX_HISTORY_TURNS)
+        if len(_SESSION_STORE) > MAX_SESSIONS:
+            _SESSION_STORE.popitem(last=False)
     return _SESSION_STORE[session_id]
 
 
+async def query_database(cypher_chain: GraphCypherQAChain, query: str) -> dict:
+    """Runs the query through the Cypher chain, falling back to a default response if the query fails.
 
-@click.command()
-@click.option(
-    "--model",
-    type=click.Choice([model.value for model in Model]),
-    default=Model.GPT4_Turbo,
-    help="The model to use for the assistant LLM.",
-)
-@click.option("--debug", is_flag=True, help="Whether to enable debug mode.")
-@click.option(
-    "--temperature",
-    type=float,
-    default=0.0,
-    help="The temperature to use for the language model. Higher values result in more diverse responses.",
-)
-@click.option(
-    "--dump-memory-on-exit",
-    is_flag=True,
-    help="Whether to dump the memory to a file on exit.",
-)
-def main(
+    Args:
+        cypher_chain (GraphCypherQAChain): The chain that handles Neo4j queries.
+        query (str): The natural language query.
+
+    Returns:
+        dict: The response of the Cypher chain, with the answer under the "result" key.
+    """
+    try:
+        return await ainvoke_with_retry(cypher_chain, query)
+    except Exception:
+        return {"result": "I'm sorry, I couldn't find any results."}
+
+
+def quick_classify(user_query: str) -> Optional[ResponseTypes]:
+    """Classifies queries that are obviously invalid or feedback, without calling the language model.
+
+    Args:
+        user_query (str): The query provided by the user.
+
+    Returns:
+        Optional[ResponseTypes]: The type of the query, or None if it has to be classified by the language model.
+    """
+    if len(user_query.strip()) < 3:
+        return ResponseTypes.INVALID
+    if _FEEDBACK_PATTERN.match(user_query):
+        return ResponseTypes.FEEDBACK
+    return None
+
+
+async def stream_response(
+    chain_with_history: RunnableWithMessageHistory,
+    context: str,
+    user_query: str,
+    config: dict,
+    on_chunk: Callable[[str], None],
+) -> None:
+    """Responds to the user query given the context, passing the response to `on_chunk` as it is generated.
+
+    Args:
+        chain_with_history (RunnableWithMessageHistory): The chain that responds to the query given the context.
+        context (str): The context built by the response handler.
+        user_query (str): The query provided by the user.
+        config (dict): The config of the chain with history, containing the session ID.
+        on_chunk (Callable[[str], None]): Called with the content of each chunk of the response.
+    """
+    async for chunk in astream_with_retry(
+        chain_with_history,
+        {"context": context, "instructions": _RESPONSE_INSTRUCTIONS, "question": user_query},
+        config=config,
+    ):
+        on_chunk(chunk.content)
+
+
+async def respond(
+    router_chain: Runnable,
+    chain_with_history: RunnableWithMessageHistory,
+    cypher_chain: GraphCypherQAChain,
+    user_query: str,
+    config: dict,
+    on_chunk: Callable[[str], None],
+) -> None:
+    """Responds to the user query, passing the response to `on_chunk` as it is generated.
+
+    Queries that `quick_classify` recognizes are responded to right away. Otherwise, a single call classifies the
+    query and responds to it directly, unless it calls the classify_and_reply tool.
+    In that case a second call responds to it, given the context built by the matching response handler. On the first
+    turn of a session, the database is queried speculatively while the query is being classified. Later turns query
+    it once the classification has provided any relevant information from past interactions.
+
+    Args:
+        router_chain (Runnable): The chain that classifies the query or responds to it, with the tool and the
+            routing instructions bound.
+        chain_with_history (RunnableWithMessageHistory): The chain that responds to the query given the context.
+        cypher_chain (GraphCypherQAChain): The chain that handles Neo4j queries.
+        user_query (str): The query provided by the user.
+        config (dict): The config of the chain with history, containing the session ID.
+        on_chunk (Callable[[str], None]): Called with the content of each chunk of the response.
+    """
+    # obvious cases are classified locally, skipping both the routing call and the speculative database query
+    response_type = quick_classify(user_query)
+    if response_type is not None:
+        context = ResponseHandlerFactory.create_response_handler(response_type).get_context()
+        await stream_response(chain_with_history, context, user_query, config, on_chunk)
+        return
+
+    history = get_session_history(config["configurable"]["session_id"])
+
+    # the Cypher chain runs in an executor thread that cannot be cancelled, so the database is only queried
+    # speculatively on the first turn, when there are no past interactions for the classification to add to the query
+    cypher_task = None
+    if not history.messages:
+        cypher_task = asyncio.create_task(query_database(cypher_chain, user_query))
+
+    routing_res = AIMessageChunk(content="")
+    async for chunk in astream_with_retry(
+        router_chain,
+        {
+            "history": history.messages,
+            "context": _ROUTING_CONTEXT,
+            "question": user_query,
+        }
+    ):
+        routing_res += chunk
+        if not routing_res.tool_call_chunks:
+            on_chunk(chunk.content)
+
+    if not routing_res.tool_call_chunks:
+        # the query was responded to directly, the router chain does not record the exchange itself
+        history.add_user_message(user_query)
+        history.add_ai_message(routing_res.content)
+        return
+
+    # tool calls whose arguments could not be parsed are only listed in invalid_tool_calls
+    tool_args = routing_res.tool_calls[0]["args"] if routing_res.tool_calls else {}
+    # if the query is not classified, default to invalid query
+    response_handler = ResponseHandlerFactory.create_response_handler_from_code(tool_args.get("type"))
+
+    if response_handler.type_ == ResponseTypes.QUERY:
+        if cypher_task is not None:
+            db_response = await cypher_task
+        else:
+            # include past history in the context
+            cypher_hint = tool_args.get("cypher_hint", "")
+            db_response = await query_database(cypher_chain, " ".join((cypher_hint, user_query)))
+        context = response_handler.get_context(db_response)
+    else:
+        context = response_handler.get_context()
+
+    await stream_response(chain_with_history, context, user_query, config, on_chunk)
+
+
+async def read_user_input() -> str:
+    """Reads a line from the standard input without blocking the event loop.
+
+    The line is read in a daemon thread rather than through an async pipe on the standard streams, which would leave
+    the standard output non-blocking for the Rich console.
+
+    Returns:
+        str: The line entered by the user.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(set_outcome: Callable, outcome) -> None:
+        # the future is cancelled if the user exits while the line is being read
+        if not future.done():
+            set_outcome(outcome)
+
+    def read() -> None:
+        try:
+            line = input()
+        except BaseException as e:
+            set_outcome, outcome = future.set_exception, e
+        else:
+            set_outcome, outcome = future.set_result, line
+
+        try:
+            loop.call_soon_threadsafe(resolve, set_outcome, outcome)
+        except RuntimeError:
+            # the loop has already been closed
+            pass
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+async def amain(
+    session_id: str,
     model: str = Model.GPT4_Turbo.value,
     debug: bool = False,
     temperature: float = 0,
-    dump_memory_on_exit: bool = False,
+    classifier_model: Optional[str] = None,
 ):
-    """The main function that runs the assistant.
+    """Runs the assistant for the given session until the user exits.
 
     Args:
-
+        session_id (str): unique identifier for the session.
         model (str, optional): The model to use for the assistant LLM. Defaults to Model.GPT4_Turbo.value.
         debug (bool, optional): Whether to enable debug mode. Defaults to False.
         temperature (float, optional): The temperature to use for the language model. Defaults to 0.
-        dump_memory_on_exit (bool, optional): Whether to dump the memory to a JSON file on exit. Defaults to False.
+        classifier_model (str, optional): The model used only to classify queries. Defaults to None, in which case
+            queries are classified and responded to by the assistant LLM in a single call.
     """
 
+    # identical prompts are served from the local cache instead of the OpenAI API. This only applies to calls that
+    # are not streamed, i.e. the Cypher chain and the history summaries, and only when responses are deterministic
+    if temperature == 0:
+        set_llm_cache(SQLiteCache(database_path=LLM_CACHE_PATH))
+
     graph = create_neo4j_graph()
     system_prompt = load_system_prompt_template()
 
+    # a single connection pool is shared by all the language models, so connections are kept alive between calls
+    http_limits = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+    http_client = httpx.Client(http2=True, limits=http_limits)
+    http_async_client = httpx.AsyncClient(http2=True, limits=http_limits)
+
+    # the OpenAI clients are passed in directly, as the HTTP clients would otherwise be part of the LLM cache key.
+    # Their own retries are disabled, as transient errors are already retried by the helpers in utils.retry
+    client = openai.OpenAI(http_client=http_client, max_retries=0).chat.completions
+    async_client = openai.AsyncOpenAI(http_client=http_async_client, max_retries=0).chat.completions
+
     # the chain that handles Neo4j queries
-    cypher_chain = create_cypher_chain(graph, model, temperature=temperature, verbose=debug)
+    cypher_chain = create_cypher_chain(
+        graph,
+        model,
+        temperature=temperature,
+        verbose=debug,
+        client=client,
+        async_client=async_client,
+    )
 
-    # TODO: there's probably a way to speed this up doing a single call to the QA LLM loaded as part of the Cypher chain
-    llm = ChatOpenAI(temperature=temperature, model=model)
+    llm = ChatOpenAI(
+        temperature=temperature,
+        model=model,
+        streaming=True,
+        client=client,
+        async_client=async_client,
+    )
+
+    if classifier_model:
+        # a smaller model only classifies the query, the response is always written by the assistant LLM
+        classifier_llm = ChatOpenAI(
+            temperature=0,
+            model=classifier_model,
+            client=client,
+            async_client=async_client,
+        )
+        router_chain = system_prompt.partial(instructions=_CLASSIFIER_INSTRUCTIONS) | classifier_llm.bind_tools(
+            [CLASSIFY_TOOL], tool_choice="classify_and_reply"
+        )
+    else:
+        # classifies the query, and responds to it directly unless it needs the database
+        router_chain = system_prompt.partial(instructions=_ROUTING_INSTRUCTIONS) | llm.bind_tools(
+            [CLASSIFY_AND_REPLY_TOOL]
+        )
 
     chain_with_history = RunnableWithMessageHistory(
         # creates a chain
@@ -209,8 +523,8 @@ def main(
         history_messages_key="history",
     )
 
-    session_id = generate_session_id()
     config = {"configurable": {"session_id": session_id}}
+    compaction_task = None
 
     try:
         assistant_name = f"Assistant({model})"
@@ -222,60 +536,102 @@ def main(
         Console.print(
             Padding("(feel free to give me feedback whenever the responses don't meet your expectations!)", (0, 0, 1, 0))
         )
-        user_prompt = Text("You", style="bold blue")
+        user_prompt = Text.assemble(("You", "bold blue"), ": ")
+        response_prefix = Text(f"{assistant_name}:")
+        response_prefix.stylize("bold green", 0, 9)
 
         # an infinite loop to keep the assistant running until the user exits
         while True:
-            user_query = Prompt.ask(user_prompt)
-            query_classification_res = chain_with_history.invoke(
-                {"question": "Classify query:" + user_query}, config=config
+            # the input is read without blocking the event loop
+            Console.print(user_prompt, end="")
+            user_query = await read_user_input()
+
+            # the history is compacted while the user types, and has to be done before it is used again
+            if compaction_task is not None:
+                await compaction_task
+
+            # the response is appended to the displayed text in place and redrawn at a fixed rate, not on every chunk
+            response = response_prefix.copy()
+            with Live(response, refresh_per_second=12, console=Console):
+                await respond(router_chain, chain_with_history, cypher_chain, user_query, config, response.append)
+            Console.print()
+
+            compaction_task = asyncio.create_task(
+                compact_history(get_session_history(session_id), llm, MAX_HISTORY_TOKENS)
             )
+    finally:
+        if compaction_task is not None:
+            compaction_task.cancel()
+        await http_async_client.aclose()
+        http_client.close()
 
-            try:
-                response_handler = ResponseHandlerFactory.create_response_handler(
-                    ResponseTypes(query_classification_res.content[0])
-                )
-            except ValueError:
-                # if the query is not classified, default to invalid query
-                response_handler = ResponseHandlerFactory.create_response_handler(
-                    ResponseTypes.INVALID
-                )
-            
-            if response_handler.type_ == ResponseTypes.QUERY:
-                try:
-                    # include past history in the context
-                    additional_info = query_classification_res.content[3:] if len(query_classification_res.content) > 3 else ""
-                    db_response = cypher_chain.invoke(additional_info + " " + user_query)
-                except Exception as e:
-                    db_response = {"result": "I'm sorry, I couldn't find any results."}
-                
-                context = response_handler.get_context(db_response)
-            else:
-                context = response_handler.get_context()
-
-            user_query_response = chain_with_history.invoke(
-                {
-                    "question": context
-                    + "Using the context, respond to following query (remember to incorporate any and all past feedback):"
-                    + user_query
-                },
-                config=config,
-            )
 
-            response = Text(f"{assistant_name}:" + user_query_response.content)
-            response.stylize("bold green", 0, 9)
-            response = Padding(response, (1, 0))
-            Console.print(response)
+@click.command()
+@click.option(
+    "--model",
+    type=click.Choice([model.value for model in Model]),
+    default=Model.GPT4_Turbo,
+    help="The model to use for the assistant LLM.",
+)
+@click.option("--debug", is_flag=True, help="Whether to enable debug mode.")
+@click.option(
+    "--temperature",
+    type=float,
+    default=0.0,
+    help="The temperature to use for the language model. Higher values result in more diverse responses.",
+)
+@click.option(
+    "--classifier-model",
+    type=click.Choice([model.value for model in Model]),
+    default=None,
+    help="A smaller model to use only for classifying queries, e.g. gpt-4o-mini. By default, queries are classified "
+    "by the assistant LLM in the same call that responds to them.",
+)
+@click.option(
+    "--dump-memory-on-exit",
+    is_flag=True,
+    help="Whether to dump the memory to a file on exit.",
+)
+def main(
+    model: str = Model.GPT4_Turbo.value,
+    debug: bool = False,
+    temperature: float = 0,
+    classifier_model: Optional[str] = None,
+    dump_memory_on_exit: bool = False,
+):
+    """The main function that runs the assistant.
+
+    Args:
+
+        model (str, optional): The model to use for the assistant LLM. Defaults to Model.GPT4_Turbo.value.
+        debug (bool, optional): Whether to enable debug mode. Defaults to False.
+        temperature (float, optional): The temperature to use for the language model. Defaults to 0.
+        classifier_model (str, optional): The model used only to classify queries. Defaults to None.
+        dump_memory_on_exit (bool, optional): Whether to dump the memory to a JSON file on exit. Defaults to False.
+    """
+    session_id = generate_session_id()
 
+    try:
+        # requests left in-flight by an interrupted turn are cancelled when the loop shuts down
+        asyncio.run(
+            amain(
+                session_id,
+                model=model,
+                debug=debug,
+                temperature=temperature,
+                classifier_model=classifier_model,
+            )
+        )
     except KeyboardInterrupt as e:
         outro_text = Text("Leaving so soon? See ya next time!", style="bold green")
         Console.print(Padding(outro_text, (1, 0)))
 
         if dump_memory_on_exit:
-            with open(f"memory-{session_id}.json", "w") as f:
-                data = json.dump(
-                    json.loads(_SESSION_STORE[session_id].json()), f, indent=2
-                )
+            # same format as the history's JSON, without the settings of BoundedChatMessageHistory
+            messages = [message.dict() for message in get_session_history(session_id).messages]
+            Path(f"memory-{session_id}.json").write_bytes(
+                orjson.dumps({"messages": messages}, option=orjson.OPT_INDENT_2)
+            )
 
 
 if __name__ == "__main__":
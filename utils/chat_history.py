@@ -0,0 +1,57 @@
+from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from utils.retry import ainvoke_with_retry
+
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+SUMMARY_REQUEST = (
+    "Summarize the conversation so far in a few sentences. Keep any feedback the user gave on how to respond, "
+    "as well as the movies and people that were discussed."
+)
+
+
+class BoundedChatMessageHistory(ChatMessageHistory):
+    """A ChatMessageHistory that only keeps the most recent messages.
+
+    A summary of the older messages (see `compact_history`) is kept as the leading system message and is never evicted.
+    """
+
+    max_messages: int = 20
+
+    def add_message(self, message: BaseMessage) -> None:
+        super().add_message(message)
+
+        has_summary = bool(self.messages) and isinstance(self.messages[0], SystemMessage)
+        excess = len(self.messages) - has_summary - self.max_messages
+        if excess > 0:
+            del self.messages[has_summary : has_summary + excess]
+
+
+async def compact_history(
+    history: ChatMessageHistory,
+    llm: BaseChatModel,
+    max_tokens: int,
+    keep_last: int = 4,
+) -> None:
+    """Replaces all but the most recent messages with a summary once the history grows past the token limit.
+    If the history cannot be summarized it is left as it is, as `BoundedChatMessageHistory` still bounds its size.
+
+    Args:
+        history (ChatMessageHistory): The history to compact.
+        llm (BaseChatModel): The language model used to summarize the older messages.
+        max_tokens (int): The number of tokens the history may hold before it is compacted.
+        keep_last (int, optional): The number of most recent messages kept as they are. Defaults to 4.
+    """
+    older_messages = history.messages[:-keep_last]
+    try:
+        if not older_messages or llm.get_num_tokens_from_messages(history.messages) <= max_tokens:
+            return
+
+        # an existing summary is part of the older messages, so it is folded into the new one
+        summary = await ainvoke_with_retry(llm, [*older_messages, HumanMessage(content=SUMMARY_REQUEST)])
+    except Exception:
+        return
+
+    history.messages = [SystemMessage(content=SUMMARY_PREFIX + summary.content), *history.messages[-keep_last:]]
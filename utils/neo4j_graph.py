@@ -0,0 +1,97 @@
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import neo4j
+from langchain_community.graphs import Neo4jGraph
+from langchain_core.utils import get_from_dict_or_env
+
+
+_DRIVERS: Dict[Tuple[str, str], neo4j.Driver] = {}
+
+
+def get_neo4j_driver(
+    url: Optional[str] = None,
+    user: Optional[str] = None,
+    password: Optional[str] = None,
+    max_connection_pool_size: int = 50,
+    connection_acquisition_timeout: float = 30,
+) -> neo4j.Driver:
+    """Get the process-wide Neo4j driver for the given URL and user, or create a new one if it does not exist.
+
+    Args:
+        url (str, optional): The URL of the Neo4j database. Defaults to the NEO4J_URI environment variable.
+        user (str, optional): The username of the Neo4j database. Defaults to the NEO4J_USERNAME environment variable,
+            or "neo4j".
+        password (str, optional): The password of the Neo4j database. Defaults to the NEO4J_PASSWORD environment
+            variable.
+        max_connection_pool_size (int, optional): The maximum number of connections kept in the pool. Defaults to 50.
+        connection_acquisition_timeout (float, optional): The time in seconds to wait for a connection from the pool.
+            Defaults to 30.
+
+    Returns:
+        neo4j.Driver: The Neo4j driver.
+    """
+    global _DRIVERS
+
+    url = get_from_dict_or_env({"url": url}, "url", "NEO4J_URI")
+    user = user or os.getenv("NEO4J_USERNAME", "neo4j")
+    password = get_from_dict_or_env({"password": password}, "password", "NEO4J_PASSWORD")
+
+    key = (url, user)
+    if key not in _DRIVERS:
+        _DRIVERS[key] = neo4j.GraphDatabase.driver(
+            url,
+            auth=(user, password),
+            max_connection_pool_size=max_connection_pool_size,
+            connection_acquisition_timeout=connection_acquisition_timeout,
+        )
+    return _DRIVERS[key]
+
+
+class PooledNeo4jGraph(Neo4jGraph):
+    """A Neo4jGraph that runs its queries on a shared driver instead of creating its own.
+
+    Every query opens a session on the driver's connection pool, so concurrent queries are bounded by the size of the
+    pool and wait up to the driver's acquisition timeout for a connection.
+    """
+
+    def __init__(
+        self,
+        driver: neo4j.Driver,
+        database: Optional[str] = None,
+        timeout: Optional[float] = None,
+        sanitize: bool = False,
+        refresh_schema: bool = True,
+        *,
+        enhanced_schema: bool = False,
+    ) -> None:
+        self._driver = driver
+        self._database = get_from_dict_or_env({"database": database}, "database", "NEO4J_DATABASE", "neo4j")
+        self.timeout = timeout
+        self.sanitize = sanitize
+        self._enhanced_schema = enhanced_schema
+        self.schema: str = ""
+        self.structured_schema: Dict[str, Any] = {}
+
+        # same errors as Neo4jGraph, which is not initialized as it would create its own driver
+        try:
+            self._driver.verify_connectivity()
+        except neo4j.exceptions.ServiceUnavailable:
+            raise ValueError(
+                "Could not connect to Neo4j database. Please ensure that the url is correct"
+            )
+        except neo4j.exceptions.AuthError:
+            raise ValueError(
+                "Could not connect to Neo4j database. Please ensure that the username and password are correct"
+            )
+
+        if refresh_schema:
+            try:
+                self.refresh_schema()
+            except neo4j.exceptions.ClientError as e:
+                if e.code == "Neo.ClientError.Procedure.ProcedureNotFound":
+                    raise ValueError(
+                        "Could not use APOC procedures. Please ensure the APOC plugin is installed in Neo4j and that "
+                        "'apoc.meta.data()' is allowed in Neo4j configuration "
+                    )
+                raise e
@@ -50,16 +50,22 @@ class InvalidResponseHandler(ResponseHandler):
         return f"Context: user provided invalid query."
 
 
+# the handlers are stateless, so a single instance of each is shared
+_HANDLERS = {
+    ResponseTypes.QUERY: QueryResponseHandler(),
+    ResponseTypes.MEMORY: MemoryResponseHandler(),
+    ResponseTypes.FEEDBACK: FeedbackResponseHandler(),
+    ResponseTypes.INVALID: InvalidResponseHandler(),
+}
+_HANDLERS_BY_CODE = {type_.value: handler for type_, handler in _HANDLERS.items()}
+
+
 class ResponseHandlerFactory:
     @staticmethod
     def create_response_handler(type_: ResponseTypes):
-        if type_ == ResponseTypes.QUERY:
-            return QueryResponseHandler()
-        elif type_ == ResponseTypes.MEMORY:
-            return MemoryResponseHandler()
-        elif type_ == ResponseTypes.FEEDBACK:
-            return FeedbackResponseHandler()
-        elif type_ == ResponseTypes.INVALID:
-            return InvalidResponseHandler()
-        else:
-            return InvalidResponseHandler()
+        return _HANDLERS.get(type_, _HANDLERS[ResponseTypes.INVALID])
+
+    @staticmethod
+    def create_response_handler_from_code(code: str):
+        # unknown codes fall back to the invalid query handler, without going through the ResponseTypes enum
+        return _HANDLERS_BY_CODE.get(code, _HANDLERS[ResponseTypes.INVALID])
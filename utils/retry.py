@@ -0,0 +1,86 @@
+from typing import Any, AsyncIterator, Optional, Tuple
+
+import neo4j
+import openai
+from langchain_core.runnables import Runnable
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+
+# dropped connections, timeouts, rate limits, server errors and transient database errors usually succeed when retried
+# shortly after. The OpenAI clients are created without retries of their own, so this covers the same errors they do.
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    neo4j.exceptions.TransientError,
+)
+RETRYABLE_STATUS_CODES = (408, 409)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether the error is transient and the call that raised it should be retried.
+
+    Args:
+        error (BaseException): The error raised by the call.
+
+    Returns:
+        bool: True if the call should be retried.
+    """
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES
+
+
+with_retry = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_exponential_jitter(initial=0.25, max=8),
+    retry=retry_if_exception(is_retryable),
+    reraise=True,
+)
+
+
+@with_retry
+async def ainvoke_with_retry(runnable: Runnable, input: Any, **kwargs) -> Any:
+    """Invokes the runnable, retrying transient errors with exponential backoff.
+
+    Args:
+        runnable (Runnable): The runnable to invoke.
+        input (Any): The input of the runnable.
+        **kwargs: Additional keyword arguments to pass to `ainvoke`.
+
+    Returns:
+        Any: The output of the runnable.
+    """
+    return await runnable.ainvoke(input, **kwargs)
+
+
+@with_retry
+async def _start_stream(runnable: Runnable, input: Any, **kwargs) -> Tuple[AsyncIterator[Any], Optional[Any]]:
+    stream = runnable.astream(input, **kwargs)
+    try:
+        return stream, await anext(stream, None)
+    except BaseException:
+        # the failed stream is closed before it is retried or the error is raised
+        await stream.aclose()
+        raise
+
+
+async def astream_with_retry(runnable: Runnable, input: Any, **kwargs) -> AsyncIterator[Any]:
+    """Streams the output of the runnable, retrying transient errors raised before the first chunk is received.
+    Errors raised after that are not retried, as the chunks received so far have already been consumed.
+
+    Args:
+        runnable (Runnable): The runnable to stream.
+        input (Any): The input of the runnable.
+        **kwargs: Additional keyword arguments to pass to `astream`.
+
+    Yields:
+        Any: The chunks of the output of the runnable.
+    """
+    stream, first_chunk = await _start_stream(runnable, input, **kwargs)
+    if first_chunk is None:
+        return
+
+    yield first_chunk
+    async for chunk in stream:
+        yield chunk